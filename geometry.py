@@ -26,6 +26,18 @@ SLEEVE = 2 * INCH
 EXTEND = 1.5 * INCH
 
 
+def line_distance(p1, p2, q1, q2):
+    # distance between the line through p1, p2 and the line through q1, q2
+    d1, d2 = p2 - p1, q2 - q1
+    e = d1.cross(d2)
+    if e.length() <= 1.e-9 * d1.length() * d2.length():
+        # parallel or collinear, so measure from q1 to the first line
+        u = d1.normal()
+        w = q1 - p1
+        return (w - w.dot(u) * u).length()
+    return abs((p1 - q1).dot(e.normal()))
+
+
 class Rod(Container):
     def __init__(self, v1, v2):
         Container.__init__(self)
@@ -40,8 +52,7 @@ class Rod(Container):
 
     def nearest_distance(self, other):
         if isinstance(other, Rod):
-            e = self.delta.cross(other.delta).normal()
-            return abs((self.v1 - other.v1).dot(e))
+            return line_distance(self.v1, self.v2, other.v1, other.v2)
         raise TypeError(other)
 
     def shares_vertex_with(self, other):
@@ -78,6 +89,14 @@ class Rod(Container):
     def original_vertices(self):
         return self._original_vertices
 
+    @property
+    def ideal_vdist(self):
+        return self._ideal_vdist
+
+    @property
+    def original_midpoint(self):
+        return self._original_midpoint
+
     @property
     def length(self):
         return self.delta.length() + 2 * self.extend
@@ -220,74 +239,54 @@ class RodTest(unittest.TestCase):
         # Write it to a scad file and examine it in OpenSCAD.
 
 
+def overlap_penalty(inter_rod_distance):
+    # piecewise linear, falling to zero once two rods sharing a vertex
+    # are comfortably further apart than minimal_distance
+    retval = None
+    points = [
+        (0, 10000),
+        (1.05 * minimal_distance, 0)
+    ]
+    for k in range(len(points) - 1):
+        this, this_value = points[k]
+        nxt, next_value = points[k+1]
+        if this <= inter_rod_distance <= nxt:
+            a = (
+                (1. * inter_rod_distance - this) /
+                (1. * nxt - this)
+            )
+            retval = this_value + a * (next_value - this_value)
+    if retval is None:
+        retval = points[-1][1]
+    # logging.debug(retval)
+    return retval
+
+
 class RodGraph(Container):
     def __init__(self):
         Container.__init__(self)
-
-        def correct_rod_length(i):
-            def f():
-                rod = self.rods()[i]
-                dsq = rod.vdist_delta ** 2
-                return 10 * dsq
-            return f
-
-        def hug_vertex(i, j):
-            def f():
-                rod, vertex = self.rods()[i], self.vertices()[j]
-                d1 = (rod.v1 - vertex).length()
-                d2 = (rod.v2 - vertex).length()
-                return 10 * min(d1, d2)
-            return f
-
-        def avoid_overlap(i, j):
-            def f():
-                rod1, rod2 = self.rods()[i], self.rods()[j]
-                inter_rod_distance = rod1.nearest_distance(rod2)
-                retval = None
-                points = [
-                    (0, 10000),
-                    (1.05 * minimal_distance, 0)
-                ]
-                for k in range(len(points) - 1):
-                    this, this_value = points[k]
-                    nxt, next_value = points[k+1]
-                    if this <= inter_rod_distance <= nxt:
-                        a = (
-                            (1. * inter_rod_distance - this) /
-                            (1. * nxt - this)
-                        )
-                        retval = this_value + a * (next_value - this_value)
-                if retval is None:
-                    retval = points[-1][1]
-                # logging.debug(retval)
-                return retval
-            return f
-
-        def encourage_symmetry(i):
-            def f():
-                rod = self.rods()[i]
-                return 1 * rod.midpoint_drift ** 2
-            return f
-
-        def lookup_vertex(v):
-            verts = self.vertices()
-            for i, vert in enumerate(verts):
-                if v == vert:
-                    return i
-            assert False, 'vertex not found'
-
         self._rods = None
-        self.terms = terms = []
+        # the objective is a sum of squared terms, each named by a
+        # (kind, i, j) triple and scored by term_value
+        self.term_specs = specs = []
         rods = self.rods()
-        for i, r in enumerate(rods):
-            terms.append(encourage_symmetry(i))
-            terms.append(correct_rod_length(i))
-            terms.append(hug_vertex(i, lookup_vertex(r.v1)))
-            terms.append(hug_vertex(i, lookup_vertex(r.v2)))
-            for j in range(i+1, len(rods)):
-                r2 = rods[j]
-                if r.shares_vertex_with(r2):
-                    terms.append(avoid_overlap(i, j))
+        # rods()[i] runs between the vertices numbered by edges()[i], so
+        # go by those integer ids rather than searching for Vectors, and
+        # find the rods sharing a vertex through each vertex's rod list
+        edges = self.edges()
+        incident = {}
+        for i, (j1, j2) in enumerate(edges):
+            incident.setdefault(j1, []).append(i)
+            incident.setdefault(j2, []).append(i)
+        for i, (j1, j2) in enumerate(edges):
+            specs.append(('symmetry', i, None))
+            specs.append(('length', i, None))
+            specs.append(('hug', i, j1))
+            specs.append(('hug', i, j2))
+            sharing = set(incident[j1] + incident[j2])
+            for j in sorted(k for k in sharing if k > i):
+                specs.append(('overlap', i, j))
+        assert len(edges) == len(rods)
 
     def to_list(self):
         lst = []
@@ -308,13 +307,54 @@ class RodGraph(Container):
             L[i] += (2 * random.random() - 1) * size
         self.from_list(L)
 
-    def fitness(self, L):
-        self.from_list(L)
+    def term_value(self, kind, i, j, ends):
+        # ends[i] is the (v1, v2) endpoint pair of rod i
+        v1, v2 = ends[i]
+        if kind == 'symmetry':
+            # keep each rod centred where it started
+            drift = 0.5 * (v1 + v2) - self.rods()[i].original_midpoint
+            return 1 * drift.length() ** 2
+        if kind == 'length':
+            # keep each rod its ideal length
+            dsq = ((v2 - v1).length() - self.rods()[i].ideal_vdist) ** 2
+            return 10 * dsq
+        if kind == 'hug':
+            # keep one end of the rod near vertex j
+            vertex = self.vertices()[j]
+            return 10 * min((v1 - vertex).length(), (v2 - vertex).length())
+        if kind == 'overlap':
+            # push apart rods i and j, which share a vertex
+            w1, w2 = ends[j]
+            return overlap_penalty(line_distance(v1, v2, w1, w2))
+        raise ValueError(kind)
+
+    def score(self, ends):
         _sum = 0.
-        for f in self.terms:
-            _sum += f() ** 2
+        for kind, i, j in self.term_specs:
+            _sum += self.term_value(kind, i, j, ends) ** 2
         return _sum ** .5
 
+    def fitness(self, L):
+        self.from_list(L)
+        return self.score([(r.v1, r.v2) for r in self.rods()])
+
+    def fitness_batch(self, candidates):
+        """
+        Score a K x D matrix (a list of K coordinate lists laid out like
+        to_list) in one call. Unlike fitness, this leaves the rods alone,
+        so a whole population can be scored against one graph.
+        """
+        n = len(self.rods())
+        results = []
+        for L in candidates:
+            assert len(L) == 6 * n
+            results.append(self.score([
+                (Vector.from_array(L[6*i:6*i+3]),
+                 Vector.from_array(L[6*i+3:6*i+6]))
+                for i in range(n)
+            ]))
+        return results
+
     def vertices(self):
         return []
 
@@ -358,12 +398,16 @@ class RodGraph(Container):
 
 class RodGraphTest(unittest.TestCase):
     class TestGraph(RodGraph):
-        def vertices(self):
-            return [
+        def __init__(self):
+            self.verts = [
                 Vector(0, 0, 0),
-                Vector(1, 0, 0),
-                Vector(0, 1, 0)
+                Vector(10, 0, 0),
+                Vector(0, 10, 0)
             ]
+            RodGraph.__init__(self)
+
+        def vertices(self):
+            return self.verts
 
         def edges(self):
             return [
@@ -375,3 +419,16 @@ class RodGraphTest(unittest.TestCase):
         # pos = tg.openscad_positive()
         # neg = tg.openscad_negative()
         self.assertTrue(True)    # put in a real test here some day
+
+    def test_fitness_batch(self):
+        tg = self.TestGraph()
+        L = tg.to_list()
+        rows = [L] + [
+            [x + (2 * random.random() - 1) for x in L]
+            for _ in range(5)
+        ]
+        batch = tg.fitness_batch(rows)
+        # the rods have not moved
+        self.assertEqual(tg.to_list(), L)
+        for row, score in zip(rows, batch):
+            self.assertAlmostEqual(tg.fitness(row), score)
@@ -0,0 +1,211 @@
+import unittest
+from geometry import Rod
+# pylint: disable=no-name-in-module
+from vector import Vector
+# pylint: enable=no-name-in-module
+
+# printable area of the bed, in mm
+PLATE_WIDTH = 200.
+PLATE_DEPTH = 200.
+
+# clearance left between neighbouring blocks on a plate
+GAP = 5.
+
+
+def half_extent(d, length, diam):
+    # a cylinder of the given length and diameter, whose unit axis has
+    # component d along some axis, reaches 0.5*length*|d| along that axis
+    # from its ends plus 0.5*diam*sqrt(1-d^2) from the rim
+    return 0.5 * length * abs(d) + 0.5 * diam * max(0., 1. - d * d) ** .5
+
+
+class Block(object):
+    """
+    One printed joint: the sleeves of every rod meeting at a vertex, minus
+    the rod cutouts. The footprint is the XY bounding box of those sleeves,
+    relative to the vertex; zmin is how far they reach below it.
+    """
+    def __init__(self, vertex):
+        self.vertex = vertex
+        self.shells = []
+        self.cutouts = []
+        self.xmin = self.ymin = float('inf')
+        self.xmax = self.ymax = float('-inf')
+        self.zmin = float('inf')
+
+    def add_sleeve(self, center, direction, length, diam):
+        c = center - self.vertex
+        for axis, lo, hi in (('x', 'xmin', 'xmax'), ('y', 'ymin', 'ymax')):
+            half = half_extent(getattr(direction, axis), length, diam)
+            mid = getattr(c, axis)
+            setattr(self, lo, min(getattr(self, lo), mid - half))
+            setattr(self, hi, max(getattr(self, hi), mid + half))
+        self.zmin = min(
+            self.zmin, c.z - half_extent(direction.z, length, diam)
+        )
+
+    @property
+    def width(self):
+        return self.xmax - self.xmin
+
+    @property
+    def depth(self):
+        return self.ymax - self.ymin
+
+    def openscad(self):
+        return (
+            '\ndifference() {{\nunion() {{\n{0}\n}}\n'.format(
+                '\n'.join(self.shells)
+            ) +
+            'union() {\n' + '\n'.join(self.cutouts) + '\n}\n}'
+        )
+
+
+def blocks(rods):
+    """
+    Gather one Block per joint of the given rods, in first-seen order.
+    """
+    dct, dct2, dct3 = {}, {}, {}
+    order = []
+    found = {}
+    for r in rods:
+        r.D(dct, dct2, dct3)
+        direction = r.delta.normal()
+        for key, center in zip(r.original_vertices, (r.v1, r.v2)):
+            if key not in found:
+                found[key] = Block(key)
+                order.append(key)
+            found[key].add_sleeve(center, direction, r.sleeve, r.swidth)
+    for key in order:
+        found[key].shells = dct[key]
+        found[key].cutouts = dct3[key]
+    return [found[key] for key in order]
+
+
+class Plate(object):
+    def __init__(self, width, depth):
+        self.width, self.depth = width, depth
+        # each shelf is [y, height, x_used]
+        self.shelves = []
+        self.used = 0.
+        # (block, x, y, rotated)
+        self.placements = []
+
+    def openscad(self):
+        parts = []
+        for block, x, y, rotated in self.placements:
+            move = (-block.vertex).make_translate() + block.openscad()
+            # lift each block so its lowest point sits on the bed
+            if rotated:
+                # rotating by 90 degrees sends (x, y) to (-y, x)
+                offset = Vector(x + block.ymax, y - block.xmin, -block.zmin)
+                move = 'rotate(90, [0, 0, 1])\n' + move
+            else:
+                offset = Vector(x - block.xmin, y - block.ymin, -block.zmin)
+            parts.append(offset.make_translate() + '\n' + move)
+        return '\n'.join(parts)
+
+
+def pack(blks, width=PLATE_WIDTH, depth=PLATE_DEPTH, gap=GAP):
+    """
+    Shelf packing, first fit by decreasing height, across as many plates
+    as it takes. Each block is turned so its long side runs along the
+    shelf. O(n log n) for the sort, then each block scans the open
+    shelves once.
+    """
+    items = []
+    for b in blks:
+        w, h = b.width + gap, b.depth + gap
+        rotated = h > w
+        if rotated:
+            w, h = h, w
+        if w > width + gap or h > depth + gap:
+            if h <= width + gap and w <= depth + gap:
+                # only fits standing the other way
+                w, h, rotated = h, w, not rotated
+            else:
+                raise ValueError(('block too large for plate', b.vertex))
+        items.append((h, w, rotated, b))
+    items.sort(key=lambda item: -item[0])
+
+    plates = []
+    for h, w, rotated, b in items:
+        placed = False
+        for plate in plates:
+            for shelf in plate.shelves:
+                if h <= shelf[1] and shelf[2] + w <= width + gap:
+                    plate.placements.append((b, shelf[2], shelf[0], rotated))
+                    shelf[2] += w
+                    placed = True
+                    break
+            if placed:
+                break
+            if plate.used + h <= depth + gap:
+                plate.shelves.append([plate.used, h, w])
+                plate.placements.append((b, 0., plate.used, rotated))
+                plate.used += h
+                placed = True
+                break
+        if not placed:
+            plate = Plate(width, depth)
+            plate.shelves.append([0., h, w])
+            plate.placements.append((b, 0., 0., rotated))
+            plate.used = h
+            plates.append(plate)
+    return plates
+
+
+class PackTest(unittest.TestCase):
+    def test1(self):
+        rods = []
+        for i in range(300):
+            v = Vector(100 * i, 0, 0)
+            rods.append(Rod(v, v + Vector(0, 0, 100)))
+        blks = blocks(rods)
+        self.assertEqual(len(blks), 600)
+        plates = pack(blks)
+        placed = [p for plate in plates for p in plate.placements]
+        self.assertEqual(len(placed), 600)
+        for plate in plates:
+            for b, x, y, rotated in plate.placements:
+                w, h = b.width, b.depth
+                if rotated:
+                    w, h = h, w
+                self.assertTrue(x + w <= plate.width + 1.e-6)
+                self.assertTrue(y + h <= plate.depth + 1.e-6)
+            # no two blocks on a plate overlap
+            boxes = []
+            for b, x, y, rotated in plate.placements:
+                w, h = (b.depth, b.width) if rotated else (b.width, b.depth)
+                boxes.append((x, y, x + w, y + h))
+            for i, (x0, y0, x1, y1) in enumerate(boxes):
+                for u0, v0, u1, v1 in boxes[i+1:]:
+                    self.assertTrue(
+                        x1 <= u0 or u1 <= x0 or y1 <= v0 or v1 <= y0
+                    )
+
+    def test_openscad(self):
+        # one upright sleeve, and one lying along y that is turned to
+        # run along the shelf; both should sit on the bed at the corner
+        upright = Block(Vector(10, 20, 30))
+        upright.add_sleeve(Vector(10, 20, 30), Vector(0, 0, 1), 50, 10)
+        lying = Block(Vector(0, 0, 0))
+        lying.add_sleeve(Vector(0, 0, 0), Vector(0, 1, 0), 50, 10)
+        self.assertAlmostEqual(upright.zmin, -25)
+        self.assertAlmostEqual(lying.zmin, -5)
+        plate = Plate(PLATE_WIDTH, PLATE_DEPTH)
+        plate.placements = [(upright, 0., 0., False), (lying, 0., 0., True)]
+        scad = plate.openscad()
+        self.assertIn(
+            Vector(5, 5, 25).make_translate() + '\n' +
+            Vector(-10, -20, -30).make_translate(), scad
+        )
+        self.assertIn(
+            Vector(25, 5, 5).make_translate() + '\nrotate(90, [0, 0, 1])',
+            scad
+        )
+
+    def test_too_big(self):
+        b = Block(Vector(0, 0, 0))
+        b.add_sleeve(Vector(0, 0, 0), Vector(1, 0, 0), 500, 10)
+        self.assertRaises(ValueError, pack, [b])
@@ -0,0 +1,233 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from math import floor
+from geometry import RodGraph
+# pylint: disable=no-name-in-module
+from vector import Vector
+# pylint: enable=no-name-in-module
+
+# endpoints closer than this (in mm) are taken to be the same joint
+WELD_TOLERANCE = 0.01
+
+
+class WeldGrid(object):
+    """
+    Hands out integer vertex ids, giving the same id to any point within
+    tolerance of one already seen. Points are hashed into cubic cells of
+    side tolerance, so a match can only be in the 27 cells around a
+    point's own and each lookup is constant time.
+    """
+    def __init__(self, tolerance=WELD_TOLERANCE):
+        self.tolerance = tolerance
+        self.vertices = []
+        self.cells = {}
+
+    def _cell(self, x, y, z):
+        if self.tolerance <= 0:
+            return (x, y, z)
+        t = self.tolerance
+        return (int(floor(x / t)), int(floor(y / t)), int(floor(z / t)))
+
+    def weld(self, x, y, z):
+        x, y, z = float(x), float(y), float(z)
+        cx, cy, cz = self._cell(x, y, z)
+        if self.tolerance > 0:
+            tsq = self.tolerance ** 2
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for dz in (-1, 0, 1):
+                        for i in self.cells.get((cx+dx, cy+dy, cz+dz), ()):
+                            v = self.vertices[i]
+                            d = (v.x-x) ** 2 + (v.y-y) ** 2 + (v.z-z) ** 2
+                            if d <= tsq:
+                                return i
+        elif (cx, cy, cz) in self.cells:
+            return self.cells[(cx, cy, cz)][0]
+        i = len(self.vertices)
+        self.vertices.append(Vector(x, y, z))
+        self.cells.setdefault((cx, cy, cz), []).append(i)
+        return i
+
+
+class ImportedGraph(RodGraph):
+    def __init__(self, verts, edges):
+        self.verts, self.edge_list = verts, edges
+        RodGraph.__init__(self)
+
+    def vertices(self):
+        return self.verts
+
+    def edges(self):
+        return self.edge_list
+
+
+class _Edges(object):
+    # collects edges between welded ids, dropping repeats and any edge
+    # whose ends welded together
+    def __init__(self):
+        self.edges = []
+        self.seen = set()
+
+    def add(self, i, j):
+        key = (min(i, j), max(i, j))
+        if i != j and key not in self.seen:
+            self.seen.add(key)
+            self.edges.append((i, j))
+
+
+def read_obj(inf, grid):
+    # "v x y z" vertices; "l" polylines and "f" face outlines give edges
+    edges = _Edges()
+    ids = []
+
+    def resolve(token):
+        n = int(token.split('/')[0])
+        return ids[n - 1] if n > 0 else ids[n]
+
+    for line in inf:
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == 'v':
+            ids.append(grid.weld(*fields[1:4]))
+        elif fields[0] in ('l', 'f'):
+            corners = [resolve(f) for f in fields[1:]]
+            pairs = zip(corners, corners[1:])
+            if fields[0] == 'f' and len(corners) > 2:
+                pairs = list(pairs) + [(corners[-1], corners[0])]
+            for i, j in pairs:
+                edges.add(i, j)
+    return edges.edges
+
+
+def read_csv(inf, grid):
+    # one edge per row: x1, y1, z1, x2, y2, z2; rows starting with # are
+    # comments, and a non-numeric first remaining row is taken as a header
+    edges = _Edges()
+    reader = csv.reader(inf)
+    first = True
+    for row in reader:
+        if not row or row[0].lstrip().startswith('#'):
+            continue
+        try:
+            coords = [float(x) for x in row[:6]]
+        except ValueError:
+            if first:
+                first = False
+                continue
+            coords = []
+        first = False
+        if len(coords) < 6:
+            raise ValueError(('bad CSV row', reader.line_num, row))
+        edges.add(grid.weld(*coords[:3]), grid.weld(*coords[3:]))
+    return edges.edges
+
+
+def read_json(inf, grid):
+    # either {"vertices": [[x, y, z], ...], "edges": [[i, j], ...]}
+    # or a bare list of segments [[[x, y, z], [x, y, z]], ...]
+    data = json.load(inf)
+    edges = _Edges()
+    if isinstance(data, dict):
+        ids = [grid.weld(*v) for v in data['vertices']]
+        for i, j in data['edges']:
+            edges.add(ids[i], ids[j])
+    else:
+        for p, q in data:
+            edges.add(grid.weld(*p), grid.weld(*q))
+    return edges.edges
+
+
+READERS = {
+    '.obj': read_obj,
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def load(filename, tolerance=WELD_TOLERANCE):
+    """
+    Build a RodGraph from an OBJ wireframe, an edge-list CSV or JSON,
+    chosen by file extension. Endpoints within tolerance are welded into
+    one vertex, numbered in order of first appearance.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in READERS:
+        raise ValueError(('unknown file type', filename))
+    grid = WeldGrid(tolerance)
+    with open(filename) as inf:
+        edges = READERS[ext](inf, grid)
+    return ImportedGraph(grid.vertices, edges)
+
+
+class LoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, text):
+        filename = os.path.join(self.dir, name)
+        with open(filename, 'w') as outf:
+            outf.write(text)
+        return filename
+
+    def test_weld(self):
+        grid = WeldGrid(0.1)
+        a = grid.weld(0, 0, 0)
+        self.assertEqual(grid.weld(0.05, -0.05, 0.05), a)
+        self.assertEqual(grid.weld(-0.09, 0, 0), a)
+        self.assertNotEqual(grid.weld(0.2, 0, 0), a)
+        self.assertEqual(len(grid.vertices), 2)
+
+    def test_obj(self):
+        # a square face, its diagonal, and a corner given twice
+        g = load(self.write('sq.obj', '\n'.join([
+            'v 0 0 0', 'v 100 0 0', 'v 100 100 0', 'v 0 100 0',
+            'v 100.001 100 0',
+            'f 1 2 3 4', 'l 1 5', 'l 2 1'
+        ])))
+        self.assertEqual(len(g.vertices()), 4)
+        self.assertEqual(len(g.edges()), 5)
+        self.assertEqual(len(g.rods()), 5)
+
+    def test_csv_json(self):
+        rows = ['x1,y1,z1,x2,y2,z2', '0,0,0,100,0,0', '100,0,0,0,100,0',
+                '0,100,0.002,0,0,0']
+        g = load(self.write('tri.csv', '\n'.join(rows)))
+        self.assertEqual((len(g.vertices()), len(g.edges())), (3, 3))
+        g2 = load(self.write('tri.json', json.dumps({
+            'vertices': [[0, 0, 0], [100, 0, 0], [0, 100, 0]],
+            'edges': [[0, 1], [1, 2], [2, 0]]
+        })))
+        self.assertEqual(g2.edges(), g.edges())
+        self.assertEqual(g.fitness(g.to_list()), g2.fitness(g2.to_list()))
+
+    def test_csv_errors(self):
+        for rows in (['0,0,0,100,0,0', '1,2,3'],
+                     ['0,0,0,100,0,0', 'x,0,0,0,0,0'],
+                     ['1,2,3', '0,0,0,100,0,0']):
+            filename = self.write('bad.csv', '\n'.join(rows))
+            self.assertRaises(ValueError, load, filename)
+
+    def test_csv_header(self):
+        # a header after blank or comment lines is still a header, but
+        # only once
+        rows = ['', '# a comment', '', 'x1,y1,z1,x2,y2,z2', '0,0,0,100,0,0']
+        g = load(self.write('hdr.csv', '\n'.join(rows)))
+        self.assertEqual(len(g.edges()), 1)
+        filename = self.write('hdr2.csv', '\n'.join(rows + ['a,b,c,d,e,f']))
+        self.assertRaises(ValueError, load, filename)
+
+    def test_straight_run(self):
+        # two collinear rods meeting at a joint
+        g = load(self.write('run.csv', '0,0,0,100,0,0\n100,0,0,200,0,0'))
+        L = g.to_list()
+        self.assertEqual(g.fitness_batch([L]), [g.fitness(L)])
+        moved = [x + 1 for x in L]
+        self.assertAlmostEqual(g.fitness_batch([moved])[0], g.fitness(moved))
@@ -0,0 +1,65 @@
+import random
+import unittest
+import geometry
+from shapes import Tetrahedron
+
+
+def simulated_anneal(func, initial, niter):
+
+    def make_random(size):
+        return [(2 * random.random() - 1) * size for _ in range(len(initial))]
+
+    def add(lst1, lst2):
+        return [x + y for x, y in zip(lst1, lst2)]
+
+    x = initial
+    f = func(x)
+    N = niter * len(initial)
+    size = 6.35
+    mult = (0.01 / 6.35) ** (1. / N)
+    for _ in range(N):
+        delta = make_random(size)
+        candidate = add(x, delta)
+        f1 = func(candidate)
+        if f1 < f:
+            x = candidate
+            f = f1
+        size *= mult
+    return x
+
+
+def evolution_strategy(batch_func, initial, niter, parents=4, children=24):
+    # A (parents + children) evolution strategy on simulated_anneal's
+    # step schedule. Each generation mutates the parents into children,
+    # scores them with one call to batch_func (see RodGraph.fitness_batch),
+    # and keeps the best of parents and children together, so it never
+    # does worse than initial. niter means what it does for
+    # simulated_anneal: about niter * len(initial) evaluations in all.
+    generations = max(1, niter * len(initial) // children)
+    size = geometry.minimal_distance
+    mult = (0.01 / size) ** (1. / generations)
+    population = [list(initial)]
+    scores = batch_func(population)
+    for _ in range(generations):
+        offspring = [
+            [x + (2 * random.random() - 1) * size
+             for x in population[k % len(population)]]
+            for k in range(children)
+        ]
+        ranked = sorted(
+            zip(scores + batch_func(offspring), population + offspring),
+            key=lambda pair: pair[0]
+        )[:parents]
+        scores = [f for f, _ in ranked]
+        population = [x for _, x in ranked]
+        size *= mult
+    return population[0]
+
+
+class EvolutionStrategyTest(unittest.TestCase):
+    def test1(self):
+        random.seed(0)
+        tg = Tetrahedron(100)
+        initial = [x + (2 * random.random() - 1) for x in tg.to_list()]
+        result = evolution_strategy(tg.fitness_batch, initial, niter=5)
+        self.assertTrue(tg.fitness(result) <= tg.fitness(initial))
@@ -0,0 +1,78 @@
+from math import pi
+from geometry import Vector, RodGraph
+
+
+class Tetrahedron(RodGraph):
+    """
+    from shapes import *
+    print Tetrahedron(100).openscad()
+    """
+    def __init__(self, size):
+        v0 = Vector(size, 0, 0)
+        v1 = v0.rotate(Vector(0, 0, 2*pi / 3))
+        v2 = v0.rotate(Vector(0, 0, 4*pi / 3))
+        v3 = Vector(0, 0, size * 2**.5)
+        center = 0.25 * (v0 + v1 + v2 + v3)
+        self.v0 = v0 - center
+        self.v1 = v1 - center
+        self.v2 = v2 - center
+        self.v3 = v3 - center
+        RodGraph.__init__(self)
+
+    def vertices(self):
+        return [self.v0, self.v1, self.v2, self.v3]
+
+    def edges(self):
+        return [
+            (0, 1), (0, 2), (0, 3),
+            (1, 2), (1, 3),
+            (2, 3)
+        ]
+
+
+class Octohedron(RodGraph):
+    def __init__(self, size):
+        x = (2 ** .5) * size
+        self.v0 = Vector(0, 0, x)
+        self.v1 = Vector(0, 0, -x)
+        self.v2 = Vector(0, x, 0)
+        self.v3 = Vector(0, -x, 0)
+        self.v4 = Vector(x, 0, 0)
+        self.v5 = Vector(-x, 0, 0)
+        RodGraph.__init__(self)
+
+    def vertices(self):
+        return [self.v0, self.v1, self.v2, self.v3, self.v4, self.v5]
+
+    def edges(self):
+        return [
+            (0, 2), (0, 3), (0, 4), (0, 5),
+            (1, 2), (1, 3), (1, 4), (1, 5),
+            (2, 4), (3, 4), (2, 5), (3, 5)
+        ]
+
+
+class Cube(RodGraph):
+    def __init__(self, size):
+        self.v0 = Vector(-.5*size, -.5*size, -.5*size)
+        self.v1 = Vector(-.5*size, -.5*size, .5*size)
+        self.v2 = Vector(-.5*size, .5*size, -.5*size)
+        self.v3 = Vector(-.5*size, .5*size, .5*size)
+        self.v4 = Vector(.5*size, -.5*size, -.5*size)
+        self.v5 = Vector(.5*size, -.5*size, .5*size)
+        self.v6 = Vector(.5*size, .5*size, -.5*size)
+        self.v7 = Vector(.5*size, .5*size, .5*size)
+        RodGraph.__init__(self)
+
+    def vertices(self):
+        return [
+            self.v0, self.v1, self.v2, self.v3,
+            self.v4, self.v5, self.v6, self.v7
+        ]
+
+    def edges(self):
+        return [
+            (0, 2), (2, 6), (6, 4), (4, 0),
+            (4, 5), (6, 7), (0, 1), (2, 3),
+            (1, 5), (5, 7), (7, 3), (1, 3)
+        ]
@@ -0,0 +1,338 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+from multiprocessing import Pool, cpu_count
+import geometry
+from geometry import INCH
+from search import evolution_strategy
+from shapes import Octohedron, Tetrahedron
+
+# module-level constants in geometry that a grid point may override
+CONSTANTS = ('SLEEVE', 'EXTEND', 'minimal_distance')
+
+# only these change the objective; SLEEVE and EXTEND just change the
+# finished rods, so points differing only in those share one solve
+OBJECTIVE = ('size', 'minimal_distance')
+
+
+@contextmanager
+def overrides(point):
+    # set the point's geometry constants for the duration of the block
+    saved = dict((name, getattr(geometry, name)) for name in CONSTANTS)
+    try:
+        for name in CONSTANTS:
+            if name in point:
+                setattr(geometry, name, point[name])
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(geometry, name, value)
+
+
+def plan(points, wave_size):
+    """
+    Order the grid points (dicts of parameter values) into waves. The
+    first wave is the first point, solved cold. Every later wave takes the
+    wave_size unsolved points closest to anything already solved, each
+    paired with that nearest solved point to warm-start from. Distances
+    are measured with every parameter scaled to its range over the grid.
+    Returns a list of waves, each a list of (index, neighbour) pairs.
+    """
+    if not points:
+        return []
+    names = sorted(points[0].keys())
+    spans = []
+    for name in names:
+        values = [p[name] for p in points]
+        spans.append((min(values), float(max(values) - min(values)) or 1.))
+    coords = [
+        [(p[name] - lo) / span for name, (lo, span) in zip(names, spans)]
+        for p in points
+    ]
+
+    def dsq(i, j):
+        return sum((a - b) ** 2 for a, b in zip(coords[i], coords[j]))
+
+    waves = [[(0, None)]]
+    nearest = {}
+    for i in range(1, len(points)):
+        nearest[i] = (dsq(i, 0), 0)
+    while nearest:
+        wave = sorted(nearest, key=lambda i: nearest[i][0])[:wave_size]
+        waves.append([(i, nearest.pop(i)[1]) for i in wave])
+        # only the points just solved can bring anyone closer
+        for i in nearest:
+            for j in wave:
+                d = dsq(i, j)
+                if d < nearest[i][0]:
+                    nearest[i] = (d, j)
+    return waves
+
+
+def solve(job):
+    """
+    Optimize one grid point. job is (graph_class, point, warm, niter),
+    where warm is None or the (ideal, solution) coordinate lists of an
+    already-solved neighbour; its offsets from its own ideal layout seed
+    this point's optimizer. Returns (ideal, fitness, coords).
+    """
+    graph_class, point, warm, niter = job
+    with overrides(point):
+        graph = graph_class(point['size'])
+        ideal = graph.to_list()
+        initial = ideal
+        if warm is not None:
+            initial = [
+                x + (s - x0) for x, x0, s in zip(ideal, warm[0], warm[1])
+            ]
+        coords = evolution_strategy(graph.fitness_batch, initial, niter)
+        fitness = graph.fitness_batch([coords])[0]
+    return ideal, fitness, coords
+
+
+def rod_lengths(graph_class, point, coords):
+    # the finished rod lengths for solved coords under the point's constants
+    with overrides(point):
+        graph = graph_class(point['size'])
+        graph.from_list(coords)
+        return [r.length for r in graph.rods()]
+
+
+class Column(object):
+    """
+    Read-only view of one column file. Rows are unpacked straight out of
+    the memory map on access, so nothing is loaded up front.
+    """
+    def __init__(self, filename, width):
+        self.width = width
+        self._fmt = '<{0}d'.format(width)
+        self._rowsize = 8 * width
+        self._map = None
+        self._file = open(filename, 'rb')
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+    def __len__(self):
+        if self._map is None:
+            return 0
+        return len(self._map) // self._rowsize
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        row = struct.unpack_from(self._fmt, self._map, i * self._rowsize)
+        return row[0] if self.width == 1 else row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultStore(object):
+    """
+    Sweep results kept as one little-endian float64 file per column in a
+    directory, plus schema.json naming the columns and their widths. The
+    schema is fixed by the first row appended; reopening a directory
+    appends to what is there.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.schema = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        if os.path.exists(self._schema_file()):
+            with open(self._schema_file()) as inf:
+                self.schema = [tuple(c) for c in json.load(inf)]
+
+    def _schema_file(self):
+        return os.path.join(self.path, 'schema.json')
+
+    def _column_file(self, name):
+        return os.path.join(self.path, name + '.f64')
+
+    def append(self, row):
+        # row maps each column name to a number or a list of numbers
+        if self.schema is None:
+            self.schema = [
+                (name, len(value) if isinstance(value, (list, tuple)) else 1)
+                for name, value in sorted(row.items())
+            ]
+            with open(self._schema_file(), 'w') as outf:
+                json.dump(self.schema, outf)
+        # check the whole row before writing any of it, so a bad row
+        # cannot leave the columns with different numbers of rows
+        packed = []
+        for name, width in self.schema:
+            if name not in row:
+                raise ValueError(('missing column', name))
+            value = row[name]
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            if len(value) != width:
+                raise ValueError((name, width, len(value)))
+            packed.append((name, struct.pack('<{0}d'.format(width), *value)))
+        for name, data in packed:
+            with open(self._column_file(name), 'ab') as outf:
+                outf.write(data)
+
+    def column(self, name):
+        if self.schema is None:
+            raise ValueError(('no rows in store yet', self.path, name))
+        return Column(self._column_file(name), dict(self.schema)[name])
+
+
+def sweep(graph_class, points, store, niter=500, processes=None):
+    """
+    Optimize graph_class(point['size']) at every grid point, in waves of
+    parallel jobs ordered by plan(), appending each result to the store
+    as the point's parameters plus fitness, coords and rod lengths. Each
+    distinct (size, minimal_distance) is solved once, and its solution is
+    shared by every point that only varies SLEEVE or EXTEND.
+    """
+    problems, members = [], {}
+    for point in points:
+        problem = dict(
+            (name, point.get(name, getattr(geometry, name, None)))
+            for name in OBJECTIVE
+        )
+        key = tuple(problem[name] for name in OBJECTIVE)
+        if key not in members:
+            members[key] = []
+            problems.append(problem)
+        members[key].append(point)
+
+    processes = processes or cpu_count()
+    pool = Pool(processes) if processes > 1 else None
+    solved = {}
+    try:
+        for wave in plan(problems, processes):
+            jobs = [
+                (graph_class, problems[i],
+                 solved[nb] if nb is not None else None, niter)
+                for i, nb in wave
+            ]
+            if pool is None:
+                results = [solve(job) for job in jobs]
+            else:
+                results = pool.map(solve, jobs)
+            for (i, _), (ideal, fitness, coords) in zip(wave, results):
+                solved[i] = (ideal, coords)
+                key = tuple(problems[i][name] for name in OBJECTIVE)
+                for point in members[key]:
+                    row = dict(point)
+                    row.update(
+                        fitness=fitness, coords=coords,
+                        lengths=rod_lengths(graph_class, point, coords)
+                    )
+                    store.append(row)
+            logging.debug('%d of %d solves done', len(solved), len(problems))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return store
+
+
+class SweepTest(unittest.TestCase):
+    def test_plan(self):
+        points = [{'size': s, 'EXTEND': e}
+                  for s in range(10) for e in (1., 2.)]
+        waves = plan(points, 3)
+        order = [i for wave in waves for i, _ in wave]
+        self.assertEqual(sorted(order), list(range(len(points))))
+        done = set()
+        for wave in waves:
+            for i, nb in wave:
+                self.assertTrue(nb is None or nb in done)
+            done.update(i for i, _ in wave)
+
+    def test_sweep(self):
+        path = tempfile.mkdtemp()
+        try:
+            points = [{'size': s, 'minimal_distance': 6.35}
+                      for s in (100., 110., 120.)]
+            store = sweep(Tetrahedron, points, ResultStore(path),
+                          niter=5, processes=1)
+            store = ResultStore(path)
+            with store.column('size') as sizes:
+                self.assertEqual(sorted(sizes), [100., 110., 120.])
+            with store.column('coords') as coords:
+                self.assertEqual(len(coords[0]), 36)
+            with store.column('lengths') as lengths:
+                self.assertEqual(len(lengths[-1]), 6)
+        finally:
+            shutil.rmtree(path)
+
+    def test_shared_solve(self):
+        # EXTEND only lengthens the finished rods, by 2 * EXTEND each
+        path = tempfile.mkdtemp()
+        try:
+            points = [{'size': 100., 'EXTEND': e} for e in (10., 20.)]
+            store = sweep(Tetrahedron, points, ResultStore(path),
+                          niter=5, processes=1)
+            with store.column('coords') as coords:
+                self.assertEqual(coords[0], coords[1])
+            with store.column('lengths') as lengths:
+                for a, b in zip(lengths[0], lengths[1]):
+                    self.assertAlmostEqual(b - a, 20.)
+        finally:
+            shutil.rmtree(path)
+
+    def test_bad_row(self):
+        path = tempfile.mkdtemp()
+        try:
+            store = ResultStore(path)
+            store.append({'a': 1., 'b': [1., 2.]})
+            self.assertRaises(ValueError, store.append, {'a': 2., 'b': [3.]})
+            self.assertRaises(ValueError, store.append, {'a': 2.})
+            with store.column('a') as column:
+                self.assertEqual(list(column), [1.])
+        finally:
+            shutil.rmtree(path)
+
+    def test_empty_store(self):
+        path = tempfile.mkdtemp()
+        try:
+            self.assertRaises(ValueError, ResultStore(path).column, 'size')
+        finally:
+            shutil.rmtree(path)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    # sweep the default octohedron across frame sizes from 6" to 18" rods
+    path = sys.argv[1] if len(sys.argv) > 1 else 'sweep.out'
+    points = [
+        {'size': k * INCH - 2 * geometry.EXTEND}
+        for k in [6 + 0.25 * n for n in range(49)]
+    ]
+    store = sweep(Octohedron, points, ResultStore(path))
+    with store.column('fitness') as fitness:
+        logging.info('%d points in %s, best fitness %f',
+                     len(fitness), path, min(fitness))
+
+
+if __name__ == '__main__':
+    main()